@@ -1,16 +1,26 @@
 # app.py - Enhanced Medical Prediction API with Hybrid Extraction
 import os
 import json
-import re
+import hashlib
+import itertools
+import time
 import numpy as np
 import torch
 from io import BytesIO
 from PIL import Image
 from typing import Dict, List, Set, Tuple
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from transformers import AutoTokenizer, AutoModelForTokenClassification
+from knowledge_base import CompiledKnowledgeBase, KnowledgeBaseError, KnowledgeBaseStore
+from http_cache import PreEncoded, conditional_response, encode_json, json_response
+from singleflight import SingleFlight
+from scheduler import EMERGENCY, ROUTINE, URGENT, InferenceScheduler
+from degradation import LoadShedder
+from traffic import TrafficRecorder
+from residency import ResidencyManager, ResidentModel
 import tensorflow as tf
 from tensorflow.keras.models import load_model
 from tensorflow.keras.applications.efficientnet import preprocess_input as efficientnet_preprocess
@@ -33,13 +43,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in traffic capture for replay-based performance testing (see replay.py).
+# Bodies are redacted to hashes unless TRAFFIC_CAPTURE_BODIES=local.
+TRAFFIC_CAPTURE_PATH = os.environ.get("TRAFFIC_CAPTURE_PATH")
+if TRAFFIC_CAPTURE_PATH:
+    app.add_middleware(
+        TrafficRecorder,
+        path=TRAFFIC_CAPTURE_PATH,
+        store_bodies=os.environ.get("TRAFFIC_CAPTURE_BODIES", "none") == "local",
+    )
+    print(f"📼 Capturing traffic to: {TRAFFIC_CAPTURE_PATH}")
+
 # ---------------- LOAD MODELS ---------------- #
+# Models are owned by the residency manager: loaded at startup, unloaded after
+# their idle timeout (0 = never) or when the memory budget is exceeded, and
+# reloaded lazily on the next request that needs them.
+TEXT_MODEL_IDLE_TIMEOUT = float(os.environ.get("TEXT_MODEL_IDLE_TIMEOUT", "0"))
+IMAGE_MODEL_IDLE_TIMEOUT = float(os.environ.get("IMAGE_MODEL_IDLE_TIMEOUT", "600"))
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("MODEL_MEMORY_BUDGET_MB", "0"))  # 0 = no budget
+
+residency = ResidencyManager(
+    memory_budget_bytes=int(MODEL_MEMORY_BUDGET_MB * 2**20),
+    check_interval=float(os.environ.get("RESIDENCY_CHECK_INTERVAL", "30")),
+)
+
+
+def load_text_model():
+    # Weights are stored as safetensors, which load by memory-mapping
+    model = AutoModelForTokenClassification.from_pretrained(TEXT_MODEL_DIR, local_files_only=True)
+    model.eval()
+    return model
+
+
+def torch_model_bytes(model) -> int:
+    return sum(t.numel() * t.element_size() for t in itertools.chain(model.parameters(), model.buffers()))
+
+
 # Load text model (required)
 try:
     print("Loading text model from:", TEXT_MODEL_DIR)
     tokenizer = AutoTokenizer.from_pretrained(TEXT_MODEL_DIR, use_fast=True, local_files_only=True)
-    text_model = AutoModelForTokenClassification.from_pretrained(TEXT_MODEL_DIR, local_files_only=True)
-    text_model.eval()
+    text_residency = ResidentModel("text", load_text_model, torch_model_bytes, idle_timeout=TEXT_MODEL_IDLE_TIMEOUT)
+    text_residency.load()
+    residency.register(text_residency)
     print("✅ Text model loaded")
 except Exception as e:
     print(f"❌ Failed to load text model: {e}")
@@ -50,11 +96,19 @@ except Exception as e:
 # ... (keep existing text model loading code) ...
 
 # Image model loading - UPDATED
-image_model = None
+image_residency = None
 class_names = []
 IMG_SIZE = 256  # Your model's input size
 
 
+def load_image_model():
+    return load_model(IMAGE_MODEL_PATH, compile=False)
+
+
+def keras_model_bytes(model) -> int:
+    return int(sum(np.prod(w.shape) for w in model.weights)) * 4  # float32 weights
+
+
 if os.path.exists(CLASS_NAMES_PATH) and os.path.exists(IMAGE_MODEL_PATH):
     try:
         with open(CLASS_NAMES_PATH, "r", encoding="utf-8") as f:
@@ -62,12 +116,21 @@ if os.path.exists(CLASS_NAMES_PATH) and os.path.exists(IMAGE_MODEL_PATH):
         class_names = [c.strip().replace("_", " ") for c in class_names]
         
         print(f"Loading image model from: {IMAGE_MODEL_PATH}")
-        image_model = load_model(IMAGE_MODEL_PATH, compile=False)
-        print(f"✅ Image model loaded - Input shape: {image_model.input_shape}")
+        image_residency = ResidentModel(
+            "image", load_image_model, keras_model_bytes,
+            idle_timeout=IMAGE_MODEL_IDLE_TIMEOUT,
+            # Release graph state Keras keeps after the model object is dropped
+            on_unload=tf.keras.backend.clear_session,
+        )
+        with image_residency.acquire() as image_model:
+            print(f"✅ Image model loaded - Input shape: {image_model.input_shape}")
+        # A module-level reference would keep the weights alive after an unload
+        del image_model
+        residency.register(image_residency)
         print(f"✅ Loaded {len(class_names)} skin disease classes")
     except Exception as e:
         print(f"⚠ Image model load failed: {e}")
-        image_model = None
+        image_residency = None
         class_names = []
 else:
     print("⚠ Image model files not found — image endpoints will be disabled.")
@@ -98,129 +161,44 @@ def preprocess_pil_image(pil_img: Image.Image, target_size=(256, 256)):
     return img_array
 
 # ---------------- ENHANCED MEDICAL KNOWLEDGE BASE ---------------- #
-symptom_to_disease = {
-    "skin rash": ["eczema", "allergic reaction", "psoriasis", "dermatitis"],
-    "itching": ["allergic reaction", "scabies", "eczema", "fungal infection"],
-    "burning sensation": ["infection", "dermatitis", "neuropathy", "UTI"],
-    "fever": ["flu", "dengue", "malaria", "COVID-19", "bacterial infection"],
-    "headache": ["migraine", "flu", "sinusitis", "tension headache", "cluster headache"],
-    "cough": ["common cold", "bronchitis", "pneumonia", "asthma", "COVID-19"],
-    "chest pain": ["angina", "heart attack", "acid reflux", "pneumonia", "anxiety"],
-    "bloated": ["indigestion", "IBS", "gastric issue", "food intolerance"],
-    "stomach pain": ["ulcer", "food poisoning", "gastritis", "appendicitis", "IBS"],
-    "dizziness": ["low blood pressure", "vertigo", "dehydration", "anemia", "inner ear problem"],
-    "fatigue": ["anemia", "thyroid issue", "chronic fatigue syndrome", "depression", "sleep apnea"],
-    "sore throat": ["pharyngitis", "tonsillitis", "common cold", "strep throat"],
-    "back pain": ["muscle strain", "sciatica", "kidney stone", "herniated disc"],
-    "joint pain": ["arthritis", "gout", "injury", "lupus", "fibromyalgia"],
-    "difficulty breathing": ["asthma", "pneumonia", "anxiety", "COPD", "heart failure"],
-    "nausea": ["food poisoning", "pregnancy", "migraine", "gastritis", "motion sickness"],
-    "vomiting": ["food poisoning", "gastroenteritis", "migraine", "appendicitis"],
-    "diarrhea": ["food poisoning", "gastroenteritis", "IBS", "infection"],
-    "constipation": ["IBS", "dehydration", "medication side effect", "thyroid disorder"],
-    "runny nose": ["common cold", "allergic rhinitis", "sinusitis", "flu"],
-    "congestion": ["sinusitis", "common cold", "allergies", "deviated septum"],
-    "muscle pain": ["flu", "fibromyalgia", "overexertion", "vitamin D deficiency"],
-    "weakness": ["anemia", "thyroid disorder", "vitamin deficiency", "chronic illness"],
-    "chills": ["fever", "infection", "hypothermia", "sepsis"],
-    "sweating": ["fever", "hyperthyroidism", "menopause", "anxiety"],
-    "weight loss": ["diabetes", "hyperthyroidism", "cancer", "depression", "malabsorption"],
-    "weight gain": ["hypothyroidism", "PCOS", "cushing syndrome", "medication side effect"],
-    "loss of appetite": ["liver disease", "stomach infection", "stress", "depression", "cancer"],
-    "heart attack": ["coronary artery disease", "cardiac arrest", "myocardial infarction"],
-    "fainting": ["low blood pressure", "dehydration", "heart condition", "vasovagal syncope"],
-    "confusion": ["dementia", "delirium", "infection", "stroke", "medication side effect"],
-    "bleeding": ["injury", "hemorrhoids", "ulcer", "clotting disorder"],
-    "swelling": ["injury", "infection", "heart failure", "kidney disease", "allergic reaction"],
-}
-
-fallback_rules = {
-    "night sweats": ["tuberculosis", "lymphoma", "infection", "menopause"],
-    "rapid heartbeat": ["anxiety", "hyperthyroidism", "arrhythmia", "anemia"],
-    "pale skin": ["anemia", "shock", "poor circulation"],
-    "ear pain": ["ear infection", "sinus infection", "TMJ disorder"],
-    "eye pain": ["glaucoma", "eye infection", "migraine", "eye strain"],
-}
+# Symptom/disease mappings, severity rules, recommendations and rule patterns
+# live in a versioned JSON file so they can be updated without reloading models.
+KB_PATH = os.environ.get("KB_PATH", os.path.join(BASE_DIR, "knowledge_base.json"))
+KB_POLL_INTERVAL = float(os.environ.get("KB_POLL_INTERVAL", "5"))
+DISEASE_TOP_K = int(os.environ.get("DISEASE_TOP_K", "10"))
+IMAGE_SCORE_WEIGHT = 2.0  # Image evidence counts double in combined analysis
 
-# Severity assessment rules
-severity_rules = {
-    "emergency": [
-        "chest pain", "heart attack", "stroke", "seizure", "unconscious", 
-        "difficulty breathing", "severe bleeding", "severe allergic reaction",
-        "sudden severe headache", "loss of consciousness", "confusion with fever",
-        "inability to speak", "sudden vision loss", "severe abdominal pain",
-    ],
-    "urgent": [
-        "high fever", "persistent vomiting", "severe dehydration", "severe pain",
-        "blood in urine", "blood in stool", "severe diarrhea",
-        "fainting", "suspected appendicitis", "infected wound"
-    ],
-    "moderate": [
-        "fever", "headache", "stomach pain", "nausea", 
-        "vomiting", "dizziness", "rash", "persistent cough",
-        "sore throat", "ear pain", "back pain"
-    ],
-    "mild": [
-        "cold", "cough", "tired", "fatigue", "mild joint pain",
-        "runny nose", "congestion", "mild headache"
-    ]
-}
-
-# Recommendations based on severity
-recommendations = {
-    "emergency": [
-        "🚨 SEEK IMMEDIATE EMERGENCY CARE",
-        "Call 911 or go to the nearest emergency room",
-        "Do NOT drive yourself - call an ambulance",
-        "Do not delay - this could be life-threatening",
-        "Have someone stay with you until help arrives"
-    ],
-    "urgent": [
-        "⚠️ Seek medical attention within 24 hours",
-        "Contact your healthcare provider immediately",
-        "Consider going to urgent care if doctor unavailable",
-        "Monitor symptoms closely and seek emergency care if they worsen",
-        "Do not ignore these symptoms"
-    ],
-    "moderate": [
-        "📅 Schedule an appointment with your healthcare provider",
-        "Monitor symptoms and seek immediate care if they worsen",
-        "Stay hydrated and get adequate rest",
-        "Keep track of symptom progression",
-        "Consider over-the-counter remedies if appropriate"
-    ],
-    "mild": [
-        "👀 Monitor symptoms for changes",
-        "Ensure adequate rest and hydration",
-        "Consider over-the-counter remedies if appropriate",
-        "Consult healthcare provider if symptoms persist beyond 7-10 days",
-        "Practice good self-care and hygiene"
-    ]
-}
-
-# Additional care tips
-general_care_tips = {
-    "hydration": "Drink plenty of fluids (water, clear broths, herbal tea)",
-    "rest": "Get adequate sleep and rest to help your body recover",
-    "nutrition": "Eat nutritious, balanced meals to support your immune system",
-    "hygiene": "Practice good hygiene to prevent spread of infection",
-    "monitoring": "Keep a symptom diary to track changes and patterns",
-}
+try:
+    # Image classes are compiled into the scorer so image probabilities can be fused
+    kb_store = KnowledgeBaseStore(KB_PATH, poll_interval=KB_POLL_INTERVAL, image_classes=class_names)
+    print(f"✅ Knowledge base v{kb_store.current.version} loaded from: {KB_PATH}")
+except KnowledgeBaseError as e:
+    print(f"❌ Failed to load knowledge base: {e}")
+    raise RuntimeError("Knowledge base is required. Fix knowledge base file before continuing.")
 
 # ---------------- HYBRID EXTRACTION FUNCTIONS ---------------- #
 
-def extract_symptoms_from_model(text: str, tokenizer, model) -> Tuple[List[str], List[Dict]]:
-    """Extract symptoms using your trained NER model"""
+def extract_symptoms_batch(texts: List[str], tokenizer, model) -> List[Tuple[List[str], List[Dict]]]:
+    """Extract symptoms from several texts with one padded forward pass"""
     
-    enc = tokenizer(text, return_tensors="pt", truncation=True, return_offsets_mapping=True)
-    offsets = enc["offset_mapping"][0].tolist()
+    enc = tokenizer(texts, return_tensors="pt", truncation=True, padding=True)
 
     with torch.no_grad():
-        outputs = model(**{k: v for k, v in enc.items() if k != "offset_mapping"})
+        outputs = model(**enc)
     
-    logits = outputs.logits[0]
+    # Decode each row up to its real length, ignoring padding
+    lengths = enc["attention_mask"].sum(dim=1).tolist()
+    results = []
+    for row, length in enumerate(lengths):
+        logits = outputs.logits[row, :length]
+        tokens = tokenizer.convert_ids_to_tokens(enc["input_ids"][row, :length])
+        results.append(decode_symptoms(tokens, logits, model.config.id2label))
+    return results
+
+
+def decode_symptoms(tokens: List[str], logits: torch.Tensor, id2label: Dict) -> Tuple[List[str], List[Dict]]:
+    """BIO-decode one sequence of token logits into symptoms with confidences"""
     preds = torch.argmax(logits, dim=-1).tolist()
-    tokens = tokenizer.convert_ids_to_tokens(enc["input_ids"][0])
     
     # Calculate confidence scores
     probs = torch.softmax(logits, dim=-1)
@@ -231,8 +209,8 @@ def extract_symptoms_from_model(text: str, tokenizer, model) -> Tuple[List[str],
     current_tokens = []
     current_confidences = []
     
-    for i, (token, label_id, (start, end)) in enumerate(zip(tokens, preds, offsets)):
-        label = model.config.id2label[label_id]
+    for i, (token, label_id) in enumerate(zip(tokens, preds)):
+        label = id2label[label_id]
         confidence = float(probs[i, label_id])
         
         if label.startswith("B-"):
@@ -281,86 +259,29 @@ def extract_symptoms_from_model(text: str, tokenizer, model) -> Tuple[List[str],
     return symptoms, symptoms_with_confidence
 
 
-def normalize_symptom(symptom: str) -> str:
+def normalize_symptom(symptom: str, kb: CompiledKnowledgeBase) -> str:
     """Normalize symptom text to standard form"""
-    
-    normalizations = {
-        'chestpain': 'chest pain',
-        'stomachpain': 'stomach pain',
-        'stomachache': 'stomach pain',
-        'backpain': 'back pain',
-        'throathurts': 'sore throat',
-        'throatpain': 'sore throat',
-        'earache': 'ear pain',
-        'heartattack': 'heart attack',
-        'difficultybreathing': 'difficulty breathing',
-        'coughing': 'cough',
-        'vomiting': 'vomiting',
-        'bleeding': 'bleeding',
-        'fainting': 'fainting',
-        'fainted': 'fainting',
-        'dizzy': 'dizziness',
-        'nausea': 'nausea',
-        'tired': 'fatigue',
-        'weak': 'weakness',
-        'itching': 'itching',
-    }
-    
     symptom_lower = symptom.lower().strip()
-    return normalizations.get(symptom_lower, symptom)
+    return kb.normalizations.get(symptom_lower, symptom)
 
 
-def enhance_with_rules(text: str, model_symptoms: List[str], symptoms_with_conf: List[Dict]) -> Tuple[List[str], List[Dict]]:
+def enhance_with_rules(text: str, model_symptoms: List[str], symptoms_with_conf: List[Dict],
+                       kb: CompiledKnowledgeBase) -> Tuple[List[str], List[Dict]]:
     """Enhance model predictions with rule-based extraction"""
     
     text_lower = text.lower()
-    model_found = set(normalize_symptom(s).lower() for s in model_symptoms)
-    
-    enhancement_patterns = {
-        r'\bsevere\s+chest\s+pain\b': 'chest pain',
-        r'\bchest\s+pain\b': 'chest pain',
-        r'\bdifficulty\s+breathing\b': 'difficulty breathing',
-        r'\bcan\'?t\s+breathe\b': 'difficulty breathing',
-        r'\bshortness\s+of\s+breath\b': 'difficulty breathing',
-        r'\bsore\s+throat\b': 'sore throat',
-        r'\bthroat\s+hurts?\b': 'sore throat',
-        r'\bhigh\s+fever\b': 'fever',
-        r'\bfever\s+of\s+\d+': 'fever',
-        r'\bsevere\s+bleeding\b': 'bleeding',
-        r'\bheart\s+attack\b': 'heart attack',
-        r'\bpassed\s+out\b': 'fainting',
-        r'\bconfus(ed|ion)\b': 'confusion',
-        r'\bstomach\s+pain\b': 'stomach pain',
-        r'\bback\s+pain\b': 'back pain',
-        r'\bfever\b': 'fever',
-        r'\bcough\b': 'cough',
-        r'\bbleeding\b': 'bleeding',
-        r'\bfaint(ed|ing)?\b': 'fainting',
-        r'\bdizz(y|iness)\b': 'dizziness',
-        r'\bnausea\b': 'nausea',
-        r'\bvomit(ing)?\b': 'vomiting',
-        r'\bdiarr?h?oea\b': 'diarrhea',
-        r'\brash\b': 'rash',
-        r'\bswell(ing)?\b': 'swelling',
-        r'\bfatigue\b': 'fatigue',
-        r'\bweak(ness)?\b': 'weakness',
-    }
-    
-    non_medical = {
-        'cricket', 'football', 'basketball', 'ice cream', 'pizza', 'food', 
-        'ate', 'playing', 'game', 'working'
-    }
+    model_found = set(normalize_symptom(s, kb).lower() for s in model_symptoms)
     
     additional_symptoms = []
     additional_with_conf = []
-    for pattern, symptom_name in enhancement_patterns.items():
+    for pattern, symptom_name in kb.enhancement_patterns:
             if symptom_name.lower() in model_found:
                 continue
         
-            if symptom_name.lower() in non_medical:
+            if symptom_name.lower() in kb.non_medical:
                 continue
         
-            if re.search(pattern, text_lower):
+            if pattern.search(text_lower):
                 additional_symptoms.append(symptom_name)
                 additional_with_conf.append({
                     "symptom": symptom_name,
@@ -375,57 +296,34 @@ def enhance_with_rules(text: str, model_symptoms: List[str], symptoms_with_conf:
     return all_symptoms, all_with_conf
 
 
-def assess_severity(text: str, symptoms: List[str], diseases: List[Dict]) -> str:
+def assess_severity(text: str, symptoms: List[str], diseases: List[Dict], kb: CompiledKnowledgeBase) -> str:
     """Enhanced severity assessment"""
     text_lower = text.lower()
     
     # Emergency keywords
-    emergency_keywords = [
-        'heart attack', 'heartattack', 'cardiac arrest',
-        'chest pain', 'severe chest pain',
-        "can't breathe", "difficulty breathing", "can't speak",
-        'stroke', 'seizure', 'unconscious', 'passed out',
-        'severe bleeding', 'loss of consciousness'
-    ]
-    
-    for keyword in emergency_keywords:
+    for keyword in kb.emergency_keywords:
         if keyword in text_lower:
             return "emergency"
     
-    emergency_symptoms = ['heart attack', 'stroke', 'difficulty breathing', 'severe bleeding', 'fainting', 'seizure']
     for symptom in symptoms:
-        if any(es in symptom.lower() for es in emergency_symptoms):
+        if any(es in symptom.lower() for es in kb.emergency_symptoms):
             return "emergency"
     
     # Urgent keywords
-    urgent_keywords = [
-        'high fever', 'fever 103', 'fever 104',
-        'severe pain', 'blood in urine', 'blood in stool',
-        'severe vomiting', 'severe headache'
-    ]
-    
-    for keyword in urgent_keywords:
+    for keyword in kb.urgent_keywords:
         if keyword in text_lower:
             return "urgent"
     
     # Check diseases
-    emergency_diseases = ['heart attack', 'stroke', 'sepsis', 'anaphylaxis']
-    urgent_diseases = ['appendicitis', 'pneumonia', 'kidney stone']
-    
     for disease in diseases:
         disease_name = disease["name"].lower()
-        if any(ed in disease_name for ed in emergency_diseases):
+        if any(ed in disease_name for ed in kb.emergency_diseases):
             return "emergency"
-        if any(ud in disease_name for ud in urgent_diseases):
+        if any(ud in disease_name for ud in kb.urgent_diseases):
             return "urgent"
     
     # Moderate keywords
-    moderate_keywords = [
-        'fever', 'cough', 'sore throat', 'headache',
-        'stomach pain', 'nausea', 'vomiting', 'diarrhea'
-    ]
-    
-    for keyword in moderate_keywords:
+    for keyword in kb.moderate_keywords:
         if keyword in text_lower:
             return "moderate"
     
@@ -435,8 +333,19 @@ def assess_severity(text: str, symptoms: List[str], diseases: List[Dict]) -> str
     return "mild"
 
 
-def get_care_tips(symptoms: List[str], diseases: List[Dict]) -> List[str]:
+def prescreen_priority(text: str, kb: CompiledKnowledgeBase) -> int:
+    """Cheap keyword pre-screen (assess_severity's keyword lists) used to order the inference queue"""
+    text_lower = text.lower()
+    if any(keyword in text_lower for keyword in kb.emergency_keywords):
+        return EMERGENCY
+    if any(keyword in text_lower for keyword in kb.urgent_keywords):
+        return URGENT
+    return ROUTINE
+
+
+def get_care_tips(symptoms: List[str], diseases: List[Dict], kb: CompiledKnowledgeBase) -> List[str]:
     """Generate care tips based on symptoms"""
+    general_care_tips = kb.general_care_tips
     tips = []
     
     if any(s in ["fever", "cough", "sore throat"] for s in symptoms):
@@ -459,26 +368,167 @@ def get_care_tips(symptoms: List[str], diseases: List[Dict]) -> List[str]:
     return tips[:5]
 
 
+def score_diseases(kb: CompiledKnowledgeBase, batch_symptoms: List[List[str]],
+                   image_probs: np.ndarray = None, top_k: int = None) -> List[List[Dict]]:
+    """Score a batch of symptom lists (optionally fused with image probabilities)"""
+    results = []
+    for ranked in kb.scorer.score_batch(batch_symptoms, image_probs=image_probs,
+                                        image_weight=IMAGE_SCORE_WEIGHT, top_k=top_k):
+        if not ranked:
+            ranked = [("General check-up recommended", 1.0)]
+        results.append([{"name": name, "score": score} for name, score in ranked])
+    return results
+
+
+def image_class_vector(probs: np.ndarray, kb: CompiledKnowledgeBase) -> np.ndarray:
+    """Align raw model output with the image classes compiled into the scorer"""
+    n_classes = kb.scorer.n_image_classes
+    vec = np.zeros(n_classes, dtype=np.float32)
+    n = min(n_classes, len(probs))
+    vec[:n] = probs[:n]
+    return vec
+
+
+# ---------------- PRE-ENCODED RESPONSE BLOCKS ---------------- #
+# Fixed blocks are serialized once and spliced into responses as bytes
+TEXT_DISCLAIMER = "This is an AI-based assessment and not a substitute for professional medical advice. Always consult with a healthcare provider for proper diagnosis and treatment."
+IMAGE_DISCLAIMER = "This is an AI-based screening tool. Always consult a qualified dermatologist for accurate diagnosis and treatment."
+
+image_recommendations = {
+    "urgent": [
+        "⚠️ Consult a dermatologist immediately",
+        "This condition requires professional medical evaluation",
+        "Do not delay seeking medical care",
+        "Bring this image to your appointment"
+    ],
+    "moderate": [
+        "📅 Schedule an appointment with a dermatologist",
+        "Monitor the affected area for changes",
+        "Avoid scratching or irritating the area",
+        "Take photos to track progression"
+    ],
+    "mild": [
+        "👀 Monitor the condition",
+        "Consult a dermatologist if symptoms worsen",
+        "Keep the area clean and moisturized",
+        "Document any changes with photos"
+    ]
+}
+
+TEXT_DISCLAIMER_JSON = encode_json(TEXT_DISCLAIMER)
+IMAGE_DISCLAIMER_JSON = encode_json(IMAGE_DISCLAIMER)
+IMAGE_RECOMMENDATIONS_JSON = {severity: encode_json(recs) for severity, recs in image_recommendations.items()}
+
+# Catalog endpoints are cached per knowledge base version and revalidated by ETag
+CATALOG_MAX_AGE = int(os.environ.get("CATALOG_MAX_AGE", "30"))
+
+
+def encoded_recommendations(kb: CompiledKnowledgeBase) -> Dict[str, bytes]:
+    """Per-severity recommendation blocks of a knowledge base version, serialized once"""
+    return kb.cached("recommendations_json", lambda: {
+        severity: encode_json(recs) for severity, recs in kb.recommendations.items()
+    })
+
+
 # ---------------- API ENDPOINTS ---------------- #
 
+# Identical concurrent inputs share one model run (keyed by content hash)
+text_flight = SingleFlight()
+image_flight = SingleFlight()
+
+
+async def ensure_resident(model: ResidentModel):
+    """Reload an unloaded model outside the scheduler so a cold load never blocks the shared queue"""
+    if not model.loaded:
+        await run_in_threadpool(model.load)
+
+
+async def coalesced_text_analysis(text: str, kb: CompiledKnowledgeBase) -> Dict:
+    """Text analysis through the scheduler, shared between concurrent requests with the same text"""
+    priority = prescreen_priority(text, kb)
+    key = (kb.checksum, hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+    # While the SLO is breached, part of the non-emergency traffic skips the model.
+    # Requests that can attach to an identical in-flight run cost nothing extra.
+    if (priority != EMERGENCY and not text_flight.in_flight(key)
+            and load_shedder.should_degrade(scheduler.depth())):
+        return analyze_text_rules_only(text, kb)
+
+    async def analyze():
+        await ensure_resident(text_residency)
+        return await scheduler.submit("text", (text, kb), priority)
+
+    started = time.perf_counter()
+    result = await text_flight.do(key, analyze)
+    load_shedder.record(time.perf_counter() - started)
+    return result
+
+
+async def coalesced_image_probs(contents: bytes, pil_img: Image.Image) -> np.ndarray:
+    """Image classification through the scheduler, shared between requests with the same bytes"""
+    async def classify():
+        pre = await run_in_threadpool(preprocess_pil_image, pil_img, (IMG_SIZE, IMG_SIZE))
+        await ensure_resident(image_residency)
+        return await scheduler.submit("image", pre, ROUTINE)
+
+    key = hashlib.sha256(contents).hexdigest()
+    return await image_flight.do(key, classify)
+
+
 @app.post("/predict_text")
-def predict_text(input: InputText):
+async def predict_text(input: InputText):
     """Hybrid symptom extraction: Model + Rule-based enhancement"""
     text = input.text.strip()
     if not text:
         raise HTTPException(status_code=400, detail="Empty text")
 
+    # Pin one knowledge base version for the whole request
+    kb = kb_store.current
+    result = await coalesced_text_analysis(text, kb)
+    return json_response(result, {
+        "recommendations": encoded_recommendations(kb)[result["severity"]],
+        "disclaimer": TEXT_DISCLAIMER_JSON,
+    })
+
+
+def analyze_texts(items: List[Tuple[str, CompiledKnowledgeBase]]) -> List[Dict]:
+    """Run extraction, disease mapping and severity assessment for a batch of texts"""
+    # Step 1: Extract using model, one forward pass for the whole batch
+    with text_residency.acquire() as text_model:
+        extracted = extract_symptoms_batch([text for text, _ in items], tokenizer, text_model)
+    collected = [
+        collect_symptoms(text, kb, model_symptoms, symptoms_with_conf)
+        for (text, kb), (model_symptoms, symptoms_with_conf) in zip(items, extracted)
+    ]
+
+    # Map to diseases, one sparse product per knowledge base version in the batch
+    diseases: List[List[Dict]] = [[] for _ in items]
+    groups: Dict[int, List[int]] = {}
+    for i, (_, kb) in enumerate(items):
+        groups.setdefault(id(kb), []).append(i)
+    for indices in groups.values():
+        kb = items[indices[0]][1]
+        scored = score_diseases(kb, [collected[i]["symptoms"] for i in indices])
+        for i, ranked in zip(indices, scored):
+            diseases[i] = ranked
+
+    return [
+        text_result(text, kb, found, ranked)
+        for (text, kb), found, ranked in zip(items, collected, diseases)
+    ]
+
+
+def collect_symptoms(text: str, kb: CompiledKnowledgeBase, model_symptoms: List[str],
+                     symptoms_with_conf: List[Dict]) -> Dict:
+    """Normalize model output, add rule-based symptoms and remove duplicates"""
     print(f"\n{'='*70}")
     print(f"📝 Input: {text}")
     print(f"{'='*70}")
 
-    # Step 1: Extract using model
-    model_symptoms, symptoms_with_conf = extract_symptoms_from_model(text, tokenizer, text_model)
-    
     # Normalize
-    model_symptoms = [normalize_symptom(s) for s in model_symptoms]
+    model_symptoms = [normalize_symptom(s, kb) for s in model_symptoms]
     for item in symptoms_with_conf:
-        item["symptom"] = normalize_symptom(item["symptom"])
+        item["symptom"] = normalize_symptom(item["symptom"], kb)
     
     print(f"🤖 Model extracted: {model_symptoms}")
     if symptoms_with_conf:
@@ -486,7 +536,7 @@ def predict_text(input: InputText):
         print(f"   Confidences: {conf_list}")
 
     # Step 2: Enhance with rules
-    all_symptoms, all_with_conf = enhance_with_rules(text, model_symptoms, symptoms_with_conf)
+    all_symptoms, all_with_conf = enhance_with_rules(text, model_symptoms, symptoms_with_conf, kb)
     
     rule_added = [s for s in all_symptoms if s not in model_symptoms]
     if rule_added:
@@ -504,58 +554,52 @@ def predict_text(input: InputText):
             unique_symptoms.append(symptom)
             unique_with_conf.append(conf_item)
     
-    symptoms = unique_symptoms
-    symptoms_with_confidence = unique_with_conf
-    
-    print(f"✅ Final symptoms: {symptoms}")
+    print(f"✅ Final symptoms: {unique_symptoms}")
     print(f"{'='*70}\n")
 
-    # Map to diseases
-    disease_counts: Dict[str, int] = {}
-    for s in symptoms:
-        matched = False
-        for sym, diseases_list in symptom_to_disease.items():
-            if sym in s.lower() or s.lower() in sym:
-                for d in diseases_list:
-                    disease_counts[d] = disease_counts.get(d, 0) + 1
-                matched = True
-        if not matched:
-            for sym, diseases_list in fallback_rules.items():
-                if sym in s.lower() or s.lower() in sym:
-                    for d in diseases_list:
-                        disease_counts[d] = disease_counts.get(d, 0) + 1
-
-    if not disease_counts:
-        disease_counts["General check-up recommended"] = 1
-
-    diseases = [
-        {"name": k, "score": v}
-        for k, v in sorted(disease_counts.items(), key=lambda x: -x[1])
-    ]
+    return {
+        "symptoms": unique_symptoms,
+        "symptoms_with_confidence": unique_with_conf,
+        "model_extracted": len(model_symptoms),
+        "rule_enhanced": len(rule_added)
+    }
+
+
+def analyze_text_rules_only(text: str, kb: CompiledKnowledgeBase) -> Dict:
+    """Fast path without the NER model: rules, disease mapping and severity only"""
+    found = collect_symptoms(text, kb, [], [])
+    diseases = score_diseases(kb, [found["symptoms"]])[0]
+    return text_result(text, kb, found, diseases, degraded=True)
+
 
-    severity = assess_severity(text, symptoms, diseases)
-    care_tips = get_care_tips(symptoms, diseases)
+def text_result(text: str, kb: CompiledKnowledgeBase, found: Dict, diseases: List[Dict],
+                degraded: bool = False) -> Dict:
+    """Assemble the per-request part of a text analysis response"""
+    symptoms = found["symptoms"]
+    # Severity and care tips look at every matched disease; only the response is cut to top-k
+    severity = assess_severity(text, symptoms, diseases, kb)
+    care_tips = get_care_tips(symptoms, diseases, kb)
 
     return {
         "symptoms": symptoms,
-        "symptoms_with_confidence": symptoms_with_confidence,
-        "diseases": diseases,
+        "symptoms_with_confidence": found["symptoms_with_confidence"],
+        "diseases": diseases[:DISEASE_TOP_K],
         "severity": severity,
-        "recommendations": recommendations[severity],
         "care_tips": care_tips,
         "extraction_stats": {
             "total_symptoms": len(symptoms),
-            "model_extracted": len(model_symptoms),
-            "rule_enhanced": len(rule_added) if rule_added else 0
+            "model_extracted": found["model_extracted"],
+            "rule_enhanced": found["rule_enhanced"],
+            "degraded": degraded
         },
-        "disclaimer": "This is an AI-based assessment and not a substitute for professional medical advice. Always consult with a healthcare provider for proper diagnosis and treatment."
+        "kb_version": kb.version
     }
 
 
 @app.post("/predict_image")
 async def predict_image(file: UploadFile = File(...)):
     """Predict skin disease from uploaded medical image"""
-    if image_model is None:
+    if image_residency is None:
         raise HTTPException(status_code=503, detail="Image model not available")
 
     try:
@@ -565,157 +609,137 @@ async def predict_image(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail=f"Cannot process image: {str(e)}")
 
     try:
-        # Preprocess image
-        pre = preprocess_pil_image(pil_img, target_size=(IMG_SIZE, IMG_SIZE))
-        
-        # Predict
-        preds = image_model.predict(pre)
-        probs = np.squeeze(preds)
-        
-        # Get top 5 predictions
-        top_k = min(5, len(probs))
-        top_idx = np.argsort(probs)[-top_k:][::-1]
-
-        diseases = []
-        for idx in top_idx:
-            if int(idx) < len(class_names):
-                disease_name = class_names[int(idx)]
-                confidence = float(probs[int(idx)])
-                
-                diseases.append({
-                    "name": disease_name,
-                    "confidence": confidence,
-                    "confidence_percentage": f"{round(confidence * 100, 2)}%"
-                })
-        
-        # Get top prediction for severity assessment
-        top_disease = diseases[0]["name"].lower() if diseases else ""
-        
-        # Assess severity based on disease type
-        severity = "moderate"  # Default
-        if any(term in top_disease for term in ["melanoma", "carcinoma", "cancer"]):
-            severity = "urgent"
-        elif any(term in top_disease for term in ["eczema", "dermatitis", "psoriasis", "fungal"]):
-            severity = "moderate"
-        else:
-            severity = "mild"
-        
-        # Generate recommendations
-        image_recommendations = []
-        if severity == "urgent":
-            image_recommendations = [
-                "⚠️ Consult a dermatologist immediately",
-                "This condition requires professional medical evaluation",
-                "Do not delay seeking medical care",
-                "Bring this image to your appointment"
-            ]
-        elif severity == "moderate":
-            image_recommendations = [
-                "📅 Schedule an appointment with a dermatologist",
-                "Monitor the affected area for changes",
-                "Avoid scratching or irritating the area",
-                "Take photos to track progression"
-            ]
-        else:
-            image_recommendations = [
-                "👀 Monitor the condition",
-                "Consult a dermatologist if symptoms worsen",
-                "Keep the area clean and moisturized",
-                "Document any changes with photos"
-            ]
-        
-        # Generate care tips based on disease
-        care_tips = []
-        if "eczema" in top_disease or "dermatitis" in top_disease:
-            care_tips = [
-                "Keep skin moisturized with fragrance-free lotions",
-                "Avoid known triggers (soaps, detergents, allergens)",
-                "Use lukewarm water for bathing",
-                "Wear soft, breathable fabrics"
-            ]
-        elif "psoriasis" in top_disease:
-            care_tips = [
-                "Moisturize regularly to prevent dryness",
-                "Avoid stress which can trigger flare-ups",
-                "Limit alcohol consumption",
-                "Get adequate sunlight (but avoid sunburn)"
-            ]
-        elif "fungal" in top_disease or "ringworm" in top_disease:
-            care_tips = [
-                "Keep affected area clean and dry",
-                "Use antifungal cream as directed",
-                "Wash clothing and bedding in hot water",
-                "Avoid sharing personal items"
-            ]
-        else:
-            care_tips = [
-                "Keep the area clean",
-                "Avoid excessive sun exposure",
-                "Monitor for changes in size, color, or texture",
-                "Consult a dermatologist for proper diagnosis"
-            ]
-
-        return {
-            "symptoms": [],  # Images show conditions, not symptoms
-            "diseases": diseases,
-            "severity": severity,
-            "recommendations": image_recommendations,
-            "care_tips": care_tips[:5],
-            "analysis_type": "image_based",
-            "disclaimer": "This is an AI-based screening tool. Always consult a qualified dermatologist for accurate diagnosis and treatment."
-        }
-
+        result = image_result_from_probs(await coalesced_image_probs(contents, pil_img))
+        return json_response(result, {
+            "recommendations": IMAGE_RECOMMENDATIONS_JSON[result["severity"]],
+            "disclaimer": IMAGE_DISCLAIMER_JSON,
+        })
     except Exception as e:
         print(f"Image prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+
+def classify_images(batch: List[np.ndarray]) -> List[np.ndarray]:
+    """Run the image model on preprocessed images and return class probabilities for each"""
+    with image_residency.acquire() as image_model:
+        preds = image_model.predict(np.concatenate(batch, axis=0))
+    return [np.squeeze(p) for p in preds]
+
+
+def image_result_from_probs(probs: np.ndarray) -> Dict:
+    """Build the image analysis response from class probabilities"""
+    # Get top 5 predictions
+    top_k = min(5, len(probs))
+    top_idx = np.argsort(probs)[-top_k:][::-1]
+
+    diseases = []
+    for idx in top_idx:
+        if int(idx) < len(class_names):
+            disease_name = class_names[int(idx)]
+            confidence = float(probs[int(idx)])
+            
+            diseases.append({
+                "name": disease_name,
+                "confidence": confidence,
+                "confidence_percentage": f"{round(confidence * 100, 2)}%"
+            })
+    
+    # Get top prediction for severity assessment
+    top_disease = diseases[0]["name"].lower() if diseases else ""
+    
+    # Assess severity based on disease type
+    severity = "moderate"  # Default
+    if any(term in top_disease for term in ["melanoma", "carcinoma", "cancer"]):
+        severity = "urgent"
+    elif any(term in top_disease for term in ["eczema", "dermatitis", "psoriasis", "fungal"]):
+        severity = "moderate"
+    else:
+        severity = "mild"
+    
+    # Generate care tips based on disease
+    care_tips = []
+    if "eczema" in top_disease or "dermatitis" in top_disease:
+        care_tips = [
+            "Keep skin moisturized with fragrance-free lotions",
+            "Avoid known triggers (soaps, detergents, allergens)",
+            "Use lukewarm water for bathing",
+            "Wear soft, breathable fabrics"
+        ]
+    elif "psoriasis" in top_disease:
+        care_tips = [
+            "Moisturize regularly to prevent dryness",
+            "Avoid stress which can trigger flare-ups",
+            "Limit alcohol consumption",
+            "Get adequate sunlight (but avoid sunburn)"
+        ]
+    elif "fungal" in top_disease or "ringworm" in top_disease:
+        care_tips = [
+            "Keep affected area clean and dry",
+            "Use antifungal cream as directed",
+            "Wash clothing and bedding in hot water",
+            "Avoid sharing personal items"
+        ]
+    else:
+        care_tips = [
+            "Keep the area clean",
+            "Avoid excessive sun exposure",
+            "Monitor for changes in size, color, or texture",
+            "Consult a dermatologist for proper diagnosis"
+        ]
+
+    return {
+        "symptoms": [],  # Images show conditions, not symptoms
+        "diseases": diseases,
+        "severity": severity,
+        "care_tips": care_tips[:5],
+        "analysis_type": "image_based",
+        "kb_version": kb_store.current.version
+    }
+
+
 @app.post("/predict_combined")
 async def predict_combined(text: str = None, file: UploadFile = File(None)):
     """Combined prediction using both text and image"""
     if not text and not file:
         raise HTTPException(status_code=400, detail="Provide either text or image or both")
     
+    kb = kb_store.current
     text_result = None
     image_result = None
     
+    image_probs = None
+    
     if text and text.strip():
         try:
-            text_result = predict_text(InputText(text=text))
+            text_result = await coalesced_text_analysis(text.strip(), kb)
         except Exception as e:
             print(f"Text prediction error: {e}")
     
-    if file and image_model is not None:
+    if file and image_residency is not None:
         try:
-            image_result = await predict_image(file)
+            contents = await file.read()
+            probs = await coalesced_image_probs(contents, Image.open(BytesIO(contents)))
+            image_result = image_result_from_probs(probs)
+            image_probs = image_class_vector(probs, kb)[np.newaxis, :]
         except Exception as e:
             print(f"Image prediction error: {e}")
     
     combined_symptoms = []
-    combined_diseases = {}
-    
     if text_result:
         combined_symptoms.extend(text_result["symptoms"])
-        for disease in text_result["diseases"]:
-            name = disease["name"]
-            combined_diseases[name] = combined_diseases.get(name, 0) + disease["score"]
-    
-    if image_result:
-        for disease in image_result["diseases"]:
-            name = disease["name"]
-            combined_diseases[name] = combined_diseases.get(name, 0) + (disease["score"] * 2)
-    
-    diseases = [
-        {"name": k, "score": v}
-        for k, v in sorted(combined_diseases.items(), key=lambda x: -x[1])
-    ]
+    
+    # Text evidence and image class probabilities fused in one sparse product
+    diseases = []
+    if text_result or image_probs is not None:
+        diseases = score_diseases(kb, [combined_symptoms], image_probs=image_probs, top_k=10)[0]
     
     if text_result:
         severity = text_result["severity"]
-        recs = text_result["recommendations"]
+        recs = kb.recommendations[severity]
         care_tips = text_result.get("care_tips", [])
     else:
         severity = "moderate"
-        recs = recommendations["moderate"]
+        recs = kb.recommendations["moderate"]
         care_tips = []
     
     return {
@@ -728,37 +752,48 @@ async def predict_combined(text: str = None, file: UploadFile = File(None)):
             "text_analysis": text_result is not None,
             "image_analysis": image_result is not None
         },
+        "kb_version": kb.version,
         "disclaimer": "This combined analysis uses both text and image inputs. Always consult with a healthcare provider."
     }
 
 
 @app.get("/")
-def root():
+def root(request: Request):
     """API health check"""
-    return {
-        "status": "healthy",
-        "service": "Medical Symptom & Disease Predictor API",
-        "version": "2.1 - Hybrid Extraction",
-        "models": {
-            "text": "loaded ✓" if text_model is not None else "not loaded ✗",
-            "image": "loaded ✓" if image_model is not None else "not loaded ✗"
-        },
-        "endpoints": {
-            "text_prediction": "/predict_text",
-            "image_prediction": "/predict_image",
-            "combined_prediction": "/predict_combined",
-            "health_check": "/"
-        },
-        "features": [
-            "Hybrid symptom extraction (Model + Rules)",
-            "Disease prediction with confidence scores",
-            "Severity assessment",
-            "Care recommendations",
-            "Image-based diagnosis",
-            "Combined text + image analysis"
-        ]
+    kb = kb_store.current
+    models = {
+        "text": "loaded ✓" if text_residency is not None else "not loaded ✗",
+        "image": "loaded ✓" if image_residency is not None else "not loaded ✗"
     }
 
+    def build():
+        return PreEncoded({
+            "status": "healthy",
+            "service": "Medical Symptom & Disease Predictor API",
+            "version": "2.1 - Hybrid Extraction",
+            "kb_version": kb.version,
+            "models": models,
+            "endpoints": {
+                "text_prediction": "/predict_text",
+                "image_prediction": "/predict_image",
+                "combined_prediction": "/predict_combined",
+                "health_check": "/",
+                "metrics": "/metrics",
+                "reload_knowledge_base": "/admin/reload_kb"
+            },
+            "features": [
+                "Hybrid symptom extraction (Model + Rules)",
+                "Disease prediction with confidence scores",
+                "Severity assessment",
+                "Care recommendations",
+                "Image-based diagnosis",
+                "Combined text + image analysis"
+            ]
+        })
+
+    payload = kb.cached(f"catalog:root:{models['text']}:{models['image']}", build)
+    return conditional_response(request, payload, CATALOG_MAX_AGE)
+
 
 @app.get("/health")
 def health_check():
@@ -767,68 +802,144 @@ def health_check():
         "status": "healthy",
         "models": {
             "text_model": {
-                "loaded": text_model is not None,
+                "loaded": text_residency is not None,
+                "resident": text_residency.loaded,
                 "path": TEXT_MODEL_DIR,
                 "type": "Token Classification (NER)"
             },
             "image_model": {
-                "loaded": image_model is not None,
-                "path": IMAGE_MODEL_PATH if image_model else None,
-                "input_shape": f"{H}x{W}x{C}" if image_model else None,
+                "loaded": image_residency is not None,
+                "resident": image_residency.loaded if image_residency else False,
+                "path": IMAGE_MODEL_PATH if image_residency else None,
+                "input_shape": f"{IMG_SIZE}x{IMG_SIZE}x3" if image_residency else None,
                 "classes": len(class_names) if class_names else 0
             }
         },
         "knowledge_base": {
-            "primary_symptoms": len(symptom_to_disease),
-            "fallback_rules": len(fallback_rules),
-            "severity_levels": len(severity_rules),
-            "total_disease_mappings": sum(len(v) for v in symptom_to_disease.values())
+            **kb_store.current.summary(),
+            "path": kb_store.path,
+            "reload_count": kb_store.reload_count,
+            "last_reload_error": kb_store.last_error
         }
     }
 
 
 @app.get("/symptoms")
-def list_symptoms():
+def list_symptoms(request: Request):
     """List all recognized symptoms"""
-    all_symptoms = list(symptom_to_disease.keys()) + list(fallback_rules.keys())
-    return {
-        "count": len(all_symptoms),
-        "symptoms": sorted(all_symptoms)
-    }
+    kb = kb_store.current
+
+    def build():
+        all_symptoms = kb.scorer.symptoms
+        return PreEncoded({
+            "count": len(all_symptoms),
+            "symptoms": sorted(all_symptoms),
+            "kb_version": kb.version
+        })
+
+    return conditional_response(request, kb.cached("catalog:symptoms", build), CATALOG_MAX_AGE)
 
 
 @app.get("/diseases")
-def list_diseases():
+def list_diseases(request: Request):
     """List all diseases in knowledge base"""
-    all_diseases = set()
-    for diseases_list in symptom_to_disease.values():
-        all_diseases.update(diseases_list)
-    for diseases_list in fallback_rules.values():
-        all_diseases.update(diseases_list)
-    
-    return {
-        "count": len(all_diseases),
-        "diseases": sorted(list(all_diseases))
-    }
+    kb = kb_store.current
+
+    def build():
+        all_diseases = kb.scorer.kb_diseases
+        return PreEncoded({
+            "count": len(all_diseases),
+            "diseases": sorted(all_diseases),
+            "kb_version": kb.version
+        })
+
+    return conditional_response(request, kb.cached("catalog:diseases", build), CATALOG_MAX_AGE)
 
 
 @app.get("/severity_levels")
-def severity_info():
+def severity_info(request: Request):
     """Get information about severity levels"""
+    kb = kb_store.current
+
+    def build():
+        return PreEncoded({
+            "levels": list(kb.severity_rules.keys()),
+            "descriptions": {
+                "emergency": "Life-threatening conditions requiring immediate emergency care",
+                "urgent": "Serious conditions requiring medical attention within 24 hours",
+                "moderate": "Conditions that should be evaluated by a healthcare provider soon",
+                "mild": "Minor conditions that can be monitored at home"
+            },
+            "keywords_per_level": {
+                level: len(keywords) for level, keywords in kb.severity_rules.items()
+            },
+            "kb_version": kb.version
+        })
+
+    return conditional_response(request, kb.cached("catalog:severity_levels", build), CATALOG_MAX_AGE)
+
+
+@app.get("/metrics")
+def metrics():
+    """Runtime counters for the inference path"""
     return {
-        "levels": list(severity_rules.keys()),
-        "descriptions": {
-            "emergency": "Life-threatening conditions requiring immediate emergency care",
-            "urgent": "Serious conditions requiring medical attention within 24 hours",
-            "moderate": "Conditions that should be evaluated by a healthcare provider soon",
-            "mild": "Minor conditions that can be monitored at home"
+        "single_flight": {
+            "text": text_flight.stats(),
+            "image": image_flight.stats()
         },
-        "keywords_per_level": {
-            level: len(keywords) for level, keywords in severity_rules.items()
-        }
+        "scheduler": scheduler.stats(),
+        "degradation": load_shedder.stats(),
+        "residency": residency.stats()
     }
 
 
+@app.post("/admin/reload_kb")
+async def reload_knowledge_base():
+    """Rebuild the knowledge base from disk and swap it in atomically"""
+    # Compile in a worker thread so in-flight requests keep being served
+    try:
+        result = await run_in_threadpool(kb_store.reload)
+    except KnowledgeBaseError as e:
+        raise HTTPException(status_code=422, detail=f"Knowledge base reload failed: {str(e)}")
+    return {**result, "knowledge_base": kb_store.current.summary()}
+
+
+# ---------------- INFERENCE SCHEDULER ---------------- #
+# Text and image jobs share one priority queue in front of the models
+SCHEDULER_MAX_BATCH = int(os.environ.get("SCHEDULER_MAX_BATCH", "8"))
+SCHEDULER_AGING_SECONDS = float(os.environ.get("SCHEDULER_AGING_SECONDS", "2.0"))
+SCHEDULER_RESERVED_SLOTS = int(os.environ.get("SCHEDULER_RESERVED_SLOTS", "1"))
+
+scheduler = InferenceScheduler(
+    {"text": analyze_texts, "image": classify_images},
+    max_batch=SCHEDULER_MAX_BATCH,
+    aging_seconds=SCHEDULER_AGING_SECONDS,
+    reserved_slots=SCHEDULER_RESERVED_SLOTS,
+)
+
+
+# ---------------- ADAPTIVE DEGRADATION ---------------- #
+# Rules-only fast path when full-path p95 or queue depth exceed the SLO (SLO_P95_MS=0 disables)
+SLO_P95_MS = float(os.environ.get("SLO_P95_MS", "1000"))
+SLO_MAX_QUEUE_DEPTH = int(os.environ.get("SLO_MAX_QUEUE_DEPTH", "64"))
+
+load_shedder = LoadShedder(SLO_P95_MS / 1000.0, SLO_MAX_QUEUE_DEPTH)
+
+
+@app.on_event("startup")
+async def start_background_workers():
+    kb_store.start_watching()
+    residency.start()
+    scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    kb_store.stop_watching()
+    residency.stop()
+    await scheduler.stop()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,93 @@
+# degradation.py - SLO-driven load shedding to a rules-only fast path
+import random
+import threading
+import time
+from typing import Dict
+
+from metrics import RollingWindow
+
+
+class LoadShedder:
+    """Decide per request whether to skip the model while the latency SLO is breached.
+
+    Full-path latencies and the scheduler queue depth are checked at most
+    every ``check_interval`` seconds. While p95 latency is above the SLO or
+    the queue is deeper than ``max_queue_depth``, the share of requests sent
+    to the fast path grows by ``step``; once both are comfortably back under
+    their limits it shrinks by ``step`` again until the full path serves
+    everything. Samples expire after ``window_seconds`` so a fully degraded
+    service does not stay degraded on stale latencies.
+    """
+
+    def __init__(self, slo_p95_seconds: float, max_queue_depth: int, window_seconds: float = 30.0,
+                 step: float = 0.25, check_interval: float = 1.0, min_samples: int = 10,
+                 recover_ratio: float = 0.8):
+        self.slo_p95_seconds = slo_p95_seconds
+        self.max_queue_depth = max_queue_depth
+        self.step = step
+        self.check_interval = check_interval
+        self.min_samples = min_samples
+        self.recover_ratio = recover_ratio
+        self.latency = RollingWindow(max_age=window_seconds)
+
+        self.shed_fraction = 0.0
+        self.degraded_served = 0
+        self.breaches = 0
+        self._last_check = 0.0
+        self._last_p95 = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.slo_p95_seconds > 0
+
+    def record(self, seconds: float):
+        """Record the latency of a request served by the full path"""
+        self.latency.add(seconds)
+
+    def should_degrade(self, queue_depth: int) -> bool:
+        if not self.enabled:
+            return False
+        self._update(queue_depth)
+        if self.shed_fraction <= 0 or random.random() >= self.shed_fraction:
+            return False
+        self.degraded_served += 1
+        return True
+
+    def _update(self, queue_depth: int):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+            values = self.latency.values()
+            p95 = self.latency.p(95) if len(values) >= self.min_samples else 0.0
+            self._last_p95 = p95
+            breached = p95 > self.slo_p95_seconds or queue_depth > self.max_queue_depth
+            healthy = (p95 <= self.slo_p95_seconds * self.recover_ratio
+                       and queue_depth <= self.max_queue_depth * self.recover_ratio)
+
+            if breached:
+                if self.shed_fraction == 0.0:
+                    self.breaches += 1
+                    print(f"⚠ SLO breached (p95={p95 * 1000:.0f}ms, queue={queue_depth}) — shedding to rules-only path")
+                self.shed_fraction = min(1.0, self.shed_fraction + self.step)
+            elif healthy and self.shed_fraction > 0.0:
+                self.shed_fraction = max(0.0, self.shed_fraction - self.step)
+                if self.shed_fraction == 0.0:
+                    print("✅ Load back under SLO — full extraction path restored")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "slo_p95_ms": round(self.slo_p95_seconds * 1000, 2),
+            "max_queue_depth": self.max_queue_depth,
+            "shed_fraction": self.shed_fraction,
+            "last_p95_ms": round(self._last_p95 * 1000, 2),
+            "degraded_served": self.degraded_served,
+            "breaches": self.breaches,
+            "full_path_latency": self.latency.summary(),
+        }
@@ -0,0 +1,62 @@
+# http_cache.py - Pre-encoded JSON payloads and conditional GET helpers
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def encode_json(obj: Any) -> bytes:
+    """Compact UTF-8 JSON encoding used for every pre-serialized payload"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class PreEncoded:
+    """A JSON payload serialized once, with a strong ETag over its bytes"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, obj: Any):
+        self.body = encode_json(obj)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+
+def conditional_response(request: Request, payload: PreEncoded, max_age: int) -> Response:
+    """Serve a pre-encoded payload, answering a matching If-None-Match with 304"""
+    headers = {
+        "ETag": payload.etag,
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+def json_with_fragments(dynamic: Dict[str, Any], fragments: Dict[str, bytes]) -> bytes:
+    """Encode ``dynamic`` and splice already-encoded values in as extra keys.
+
+    Only the per-request part of a response is serialized; fixed blocks such
+    as recommendations and disclaimers are copied in as bytes.
+    """
+    parts = [encode_json(dynamic)[:-1]]
+    sep = b"," if dynamic else b""
+    for key, value in fragments.items():
+        parts.append(sep + encode_json(key) + b":" + value)
+        sep = b","
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+def json_response(dynamic: Dict[str, Any], fragments: Dict[str, bytes]) -> Response:
+    return Response(content=json_with_fragments(dynamic, fragments), media_type="application/json")
@@ -0,0 +1,226 @@
+# knowledge_base.py - Versioned, hot-reloadable medical knowledge base
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Pattern, Sequence, Tuple
+
+from scoring import DiseaseScorer
+
+
+class KnowledgeBaseError(Exception):
+    """Raised when a knowledge base file cannot be loaded or compiled"""
+
+
+REQUIRED_SECTIONS = (
+    "version",
+    "symptom_to_disease",
+    "fallback_rules",
+    "severity_rules",
+    "recommendations",
+    "general_care_tips",
+    "normalizations",
+    "enhancement_patterns",
+    "non_medical",
+    "severity_keywords",
+)
+
+# Levels assess_severity can return and care tips get_care_tips reads by name
+SEVERITY_LEVELS = ("emergency", "urgent", "moderate", "mild")
+REQUIRED_CARE_TIPS = ("hydration", "rest", "monitoring")
+# Keyword lists read by assess_severity and the scheduler pre-screen
+SEVERITY_KEYWORD_LISTS = (
+    "emergency_keywords",
+    "emergency_symptoms",
+    "urgent_keywords",
+    "emergency_diseases",
+    "urgent_diseases",
+    "moderate_keywords",
+)
+
+
+class CompiledKnowledgeBase:
+    """Immutable snapshot of the knowledge base with its lookup structures prebuilt.
+
+    A request grabs one snapshot at the start and uses it throughout, so a
+    reload that swaps in a new version never mixes rules from two versions.
+    """
+
+    def __init__(self, data: Dict, checksum: str, source_path: Optional[str] = None,
+                 image_classes: Sequence[str] = ()):
+        missing = [key for key in REQUIRED_SECTIONS if key not in data]
+        if missing:
+            raise KnowledgeBaseError(f"Knowledge base is missing sections: {missing}")
+
+        self.version: str = str(data["version"])
+        self.checksum: str = checksum
+        self.source_path = source_path
+        self.loaded_at = time.time()
+
+        self.symptom_to_disease: Dict[str, List[str]] = data["symptom_to_disease"]
+        self.fallback_rules: Dict[str, List[str]] = data["fallback_rules"]
+        self.severity_rules: Dict[str, List[str]] = data["severity_rules"]
+        self.recommendations: Dict[str, List[str]] = data["recommendations"]
+        self.general_care_tips: Dict[str, str] = data["general_care_tips"]
+
+        # Symptom→disease edges (plain lists or {disease: weight} dicts) compiled
+        # into the sparse scoring matrix; catalogs are read from it as well.
+        try:
+            self.scorer = DiseaseScorer(self.symptom_to_disease, self.fallback_rules, image_classes)
+        except (TypeError, ValueError) as e:
+            raise KnowledgeBaseError(f"Invalid symptom mapping: {e}")
+
+        # Normalization lookup keyed on lowercase text
+        self.normalizations: Dict[str, str] = {
+            k.lower().strip(): v for k, v in data["normalizations"].items()
+        }
+        self.non_medical = frozenset(w.lower() for w in data["non_medical"])
+
+        # Precompile rule patterns once per version instead of on every request
+        try:
+            self.enhancement_patterns: List[Tuple[Pattern, str]] = [
+                (re.compile(pattern), symptom_name)
+                for pattern, symptom_name in data["enhancement_patterns"]
+            ]
+        except re.error as e:
+            raise KnowledgeBaseError(f"Invalid enhancement pattern: {e}")
+
+        # A missing list would silently switch off that part of severity triage
+        keywords = data["severity_keywords"]
+        for name in SEVERITY_KEYWORD_LISTS:
+            values = keywords.get(name)
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise KnowledgeBaseError(f"severity_keywords.{name} must be a list of strings")
+        self.emergency_keywords: Tuple[str, ...] = tuple(keywords["emergency_keywords"])
+        self.emergency_symptoms: Tuple[str, ...] = tuple(keywords["emergency_symptoms"])
+        self.urgent_keywords: Tuple[str, ...] = tuple(keywords["urgent_keywords"])
+        self.emergency_diseases: Tuple[str, ...] = tuple(keywords["emergency_diseases"])
+        self.urgent_diseases: Tuple[str, ...] = tuple(keywords["urgent_diseases"])
+        self.moderate_keywords: Tuple[str, ...] = tuple(keywords["moderate_keywords"])
+
+        for severity in set(SEVERITY_LEVELS) | set(self.severity_rules):
+            if severity not in self.recommendations:
+                raise KnowledgeBaseError(f"No recommendations for severity level '{severity}'")
+        missing_tips = [tip for tip in REQUIRED_CARE_TIPS if tip not in self.general_care_tips]
+        if missing_tips:
+            raise KnowledgeBaseError(f"Knowledge base is missing care tips: {missing_tips}")
+
+        # Derived artifacts (e.g. serialized catalogs) built at most once per version
+        self._derived: Dict[str, Any] = {}
+
+    def cached(self, name: str, build: Callable[[], Any]) -> Any:
+        """Return an artifact derived from this version, building it on first use"""
+        value = self._derived.get(name)
+        if value is None:
+            # Concurrent first calls may both build; the results are identical
+            value = self._derived.setdefault(name, build())
+        return value
+
+    def summary(self) -> Dict:
+        """Short description used by health and admin endpoints"""
+        return {
+            "version": self.version,
+            "checksum": self.checksum[:12],
+            "loaded_at": self.loaded_at,
+            "primary_symptoms": len(self.symptom_to_disease),
+            "fallback_rules": len(self.fallback_rules),
+            "severity_levels": len(self.severity_rules),
+            "total_disease_mappings": sum(len(v) for v in self.symptom_to_disease.values()),
+            "diseases": self.scorer.n_kb_diseases,
+            "matrix_nnz": int(self.scorer.matrix.nnz),
+        }
+
+
+def load_knowledge_base(path: str, image_classes: Sequence[str] = ()) -> CompiledKnowledgeBase:
+    """Read a knowledge base file from disk and compile it"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw.decode("utf-8"))
+    except (OSError, ValueError) as e:
+        raise KnowledgeBaseError(f"Cannot read knowledge base {path}: {e}")
+
+    checksum = hashlib.sha256(raw).hexdigest()
+    try:
+        return CompiledKnowledgeBase(data, checksum, source_path=path, image_classes=image_classes)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise KnowledgeBaseError(f"Malformed knowledge base {path}: {e}")
+
+
+class KnowledgeBaseStore:
+    """Holds the active knowledge base and swaps in new versions atomically.
+
+    New versions are loaded and compiled off to the side; only the final
+    reference assignment touches ``current``, so in-flight requests keep the
+    snapshot they started with and are never blocked by a reload.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 5.0, image_classes: Sequence[str] = ()):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.image_classes = list(image_classes)
+        self._current = load_knowledge_base(path, self.image_classes)
+        self._mtime = self._file_mtime()
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reload_count = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def current(self) -> CompiledKnowledgeBase:
+        return self._current
+
+    def _file_mtime(self) -> float:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return 0.0
+
+    def reload(self) -> Dict:
+        """Build the knowledge base from disk and swap it in if it changed"""
+        with self._reload_lock:
+            # Remember the attempt even on failure so the watcher does not retry a broken file
+            self._mtime = self._file_mtime()
+            try:
+                candidate = load_knowledge_base(self.path, self.image_classes)
+            except KnowledgeBaseError as e:
+                # Keep serving the previous version
+                self.last_error = str(e)
+                print(f"⚠ Knowledge base reload failed, keeping v{self._current.version}: {e}")
+                raise
+
+            self.last_error = None
+            previous = self._current
+            if candidate.checksum == previous.checksum:
+                return {"reloaded": False, "version": previous.version}
+
+            self._current = candidate
+            self.reload_count += 1
+            print(f"✅ Knowledge base swapped: v{previous.version} → v{candidate.version}")
+            return {"reloaded": True, "previous_version": previous.version, "version": candidate.version}
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            if self._file_mtime() == self._mtime:
+                continue
+            try:
+                self.reload()
+            except KnowledgeBaseError:
+                pass
+
+    def start_watching(self):
+        """Poll the knowledge base file and hot-reload it when it changes"""
+        if self._watcher is not None or self.poll_interval <= 0:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="kb-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.poll_interval + 1)
+        self._watcher = None
@@ -0,0 +1,51 @@
+# metrics.py - Small in-process latency statistics
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = int(round(q / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+class RollingWindow:
+    """Latency samples (in seconds) kept for a bounded count and age"""
+
+    def __init__(self, max_samples: int = 1000, max_age: Optional[float] = None):
+        self.max_age = max_age
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def add(self, value: float):
+        with self._lock:
+            self._samples.append((time.monotonic(), value))
+            self.total += 1
+
+    def values(self) -> List[float]:
+        with self._lock:
+            if self.max_age is not None:
+                cutoff = time.monotonic() - self.max_age
+                while self._samples and self._samples[0][0] < cutoff:
+                    self._samples.popleft()
+            return [v for _, v in self._samples]
+
+    def p(self, q: float) -> float:
+        return percentile(sorted(self.values()), q)
+
+    def summary(self) -> Dict:
+        """Count and percentiles in milliseconds"""
+        values = sorted(self.values())
+        return {
+            "count": self.total,
+            "window": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        }
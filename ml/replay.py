@@ -0,0 +1,188 @@
+# replay.py - Replay captured traffic against a local API instance
+#
+# Usage:
+#   python replay.py traffic.jsonl --target http://127.0.0.1:8000 --speed 2
+#
+# The capture must have been recorded with TRAFFIC_CAPTURE_BODIES=local for
+# requests with a body or query string; redacted entries are skipped.
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from metrics import percentile
+from traffic import summarize_response, summary_digest
+
+
+def load_capture(path: str, paths: Optional[List[str]] = None, limit: Optional[int] = None) -> List[Dict]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line of a capture still being written
+            if paths and record.get("path") not in paths:
+                continue
+            records.append(record)
+    records.sort(key=lambda r: r["ts"])
+    return records[:limit] if limit else records
+
+
+def _request_body(record: Dict, blob_dir: str) -> Optional[bytes]:
+    if not record.get("size"):
+        return b""
+    blob_path = os.path.join(blob_dir, record["sha256"])
+    if not os.path.exists(blob_path):
+        return None
+    with open(blob_path, "rb") as f:
+        return f.read()
+
+
+def _send(target: str, record: Dict, body: bytes, timeout: float) -> Dict:
+    url = target.rstrip("/") + record["path"]
+    if record.get("query"):
+        url += "?" + record["query"]
+    headers = {"Content-Type": record["content_type"]} if record.get("content_type") else {}
+    request = urllib.request.Request(url, data=body or None, headers=headers, method=record["method"])
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, response_body = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, response_body = e.code, e.read()
+    except Exception as e:
+        return {"status": None, "seconds": time.perf_counter() - started, "error": str(e)}
+    return {"status": status, "seconds": time.perf_counter() - started, "body": response_body}
+
+
+def _latency_summary(seconds: List[float]) -> Dict:
+    values = sorted(seconds)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p90_ms": round(percentile(values, 90) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def replay(records: List[Dict], blob_dir: str, target: str, speed: float, workers: int,
+           timeout: float) -> Dict:
+    """Fire captured requests at their original relative times divided by ``speed``"""
+    results: List[Optional[Dict]] = [None] * len(records)
+    skipped = 0
+    lock = threading.Lock()
+
+    def run(index: int, record: Dict, body: bytes):
+        outcome = _send(target, record, body, timeout)
+        with lock:
+            results[index] = outcome
+
+    start = time.monotonic()
+    t0 = records[0]["ts"] if records else 0.0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, record in enumerate(records):
+            body = _request_body(record, blob_dir)
+            if body is None or (record.get("query_sha256") and "query" not in record):
+                skipped += 1
+                continue
+            if speed > 0:
+                delay = (record["ts"] - t0) / speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(run, index, record, body)
+    wall = time.monotonic() - start
+
+    by_path: Dict[str, Dict] = {}
+    diffs = []
+    for index, (record, outcome) in enumerate(zip(records, results)):
+        if outcome is None:
+            continue
+        path = by_path.setdefault(record["path"], {
+            "recorded": [], "replayed": [], "errors": 0, "status_changed": 0, "result_diffs": 0,
+        })
+        path["recorded"].append(record["ms"] / 1000.0)
+        if outcome.get("error"):
+            path["errors"] += 1
+            continue
+        path["replayed"].append(outcome["seconds"])
+        if outcome["status"] != record["status"]:
+            path["status_changed"] += 1
+
+        summary = summarize_response(outcome["body"])
+        if record.get("result") is not None and summary_digest(summary) != record["result"]:
+            path["result_diffs"] += 1
+            diffs.append({"index": index, "path": record["path"], "recorded": record.get("summary"),
+                          "replayed": summary})
+
+    return {
+        "target": target,
+        "speed": speed,
+        "sent": sum(1 for r in results if r is not None),
+        "skipped": skipped,
+        "wall_seconds": round(wall, 3),
+        "paths": {
+            path: {
+                "recorded_latency": _latency_summary(stats["recorded"]),
+                "replayed_latency": _latency_summary(stats["replayed"]),
+                "errors": stats["errors"],
+                "status_changed": stats["status_changed"],
+                "result_diffs": stats["result_diffs"],
+            }
+            for path, stats in by_path.items()
+        },
+        "diff_examples": diffs[:20],
+    }
+
+
+def print_report(report: Dict):
+    print(f"Replayed {report['sent']} requests against {report['target']} "
+          f"at {report['speed']}x in {report['wall_seconds']}s ({report['skipped']} skipped)")
+    for path, stats in sorted(report["paths"].items()):
+        rec, rep = stats["recorded_latency"], stats["replayed_latency"]
+        print(f"\n{path}")
+        print(f"  recorded  p50={rec['p50_ms']}ms p90={rec['p90_ms']}ms p99={rec['p99_ms']}ms max={rec['max_ms']}ms")
+        print(f"  replayed  p50={rep['p50_ms']}ms p90={rep['p90_ms']}ms p99={rep['p99_ms']}ms max={rep['max_ms']}ms")
+        print(f"  errors={stats['errors']} status_changed={stats['status_changed']} "
+              f"result_diffs={stats['result_diffs']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay captured API traffic and compare latency and results")
+    parser.add_argument("capture", help="Capture file written by TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="Base URL of the instance under test")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Time scale: 1 = original pacing, 2 = twice as fast, 0 = no delays")
+    parser.add_argument("--path", action="append", dest="paths", help="Only replay this path (repeatable)")
+    parser.add_argument("--limit", type=int, help="Replay at most this many requests")
+    parser.add_argument("--workers", type=int, default=64, help="Maximum concurrent requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--report", help="Also write the full report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    records = load_capture(args.capture, args.paths, args.limit)
+    if not records:
+        print("No matching requests in capture", file=sys.stderr)
+        return 1
+
+    report = replay(records, args.capture + ".blobs", args.target, args.speed, args.workers, args.timeout)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# residency.py - Idle-aware model residency with a memory budget
+import gc
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import RollingWindow
+
+
+class ResidentModel:
+    """A model that is loaded on first use and can be unloaded when idle.
+
+    ``loader`` builds the model, ``size_of`` estimates its resident bytes and
+    ``on_unload`` (optional) releases framework state after the last
+    reference is dropped. Use ``acquire()`` around every use so the model is
+    never unloaded while a batch is running on it.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], size_of: Callable[[Any], int],
+                 idle_timeout: float = 0.0, on_unload: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.loader = loader
+        self.size_of = size_of
+        self.idle_timeout = idle_timeout
+        self.on_unload = on_unload
+        self.manager: Optional["ResidencyManager"] = None
+
+        self._model = None
+        self._lock = threading.RLock()
+        self._in_use = 0
+        self.last_used = 0.0
+        self.resident_bytes = 0
+        self.load_count = 0
+        self.unload_count = 0
+        self.load_seconds = RollingWindow(max_samples=100)
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used if self.last_used else 0.0
+
+    def load(self):
+        """Load the model now if it is not resident"""
+        with self._lock:
+            if self._model is not None:
+                return
+            started = time.perf_counter()
+            model = self.loader()
+            elapsed = time.perf_counter() - started
+            self._model = model
+            self.resident_bytes = self.size_of(model)
+            self.load_count += 1
+            self.load_seconds.add(elapsed)
+            self.last_used = time.monotonic()
+            print(f"✅ {self.name} model resident ({self.resident_bytes / 2**20:.0f} MB, loaded in {elapsed:.2f}s)")
+        if self.manager is not None:
+            self.manager.enforce_budget(keep=self)
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            self._in_use += 1
+        try:
+            self.load()
+            self.last_used = time.monotonic()
+            yield self._model
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self.last_used = time.monotonic()
+
+    def unload(self, reason: str) -> bool:
+        """Drop the model unless it is in use; returns True if it was unloaded"""
+        with self._lock:
+            if self._model is None or self._in_use:
+                return False
+            self._model = None
+            freed = self.resident_bytes
+            self.resident_bytes = 0
+            self.unload_count += 1
+            gc.collect()
+            if self.on_unload is not None:
+                self.on_unload()
+        print(f"💤 {self.name} model unloaded ({reason}, freed ~{freed / 2**20:.0f} MB)")
+        return True
+
+    def stats(self) -> Dict:
+        load = self.load_seconds.summary()
+        return {
+            "resident": self.loaded,
+            "resident_mb": round(self.resident_bytes / 2**20, 1),
+            "in_use": self._in_use,
+            "idle_seconds": round(self.idle_seconds(), 1),
+            "idle_timeout_seconds": self.idle_timeout,
+            "load_count": self.load_count,
+            "unload_count": self.unload_count,
+            "load_latency": {k: load[k] for k in ("count", "p50_ms", "p95_ms", "max_ms")},
+        }
+
+
+class ResidencyManager:
+    """Unloads idle models and keeps total resident size within a budget"""
+
+    def __init__(self, memory_budget_bytes: int = 0, check_interval: float = 30.0):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.check_interval = check_interval
+        self.models: Dict[str, ResidentModel] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, model: ResidentModel) -> ResidentModel:
+        model.manager = self
+        self.models[model.name] = model
+        return model
+
+    def resident_bytes(self) -> int:
+        return sum(m.resident_bytes for m in self.models.values())
+
+    def unload_idle(self):
+        for model in self.models.values():
+            if model.loaded and model.idle_timeout > 0 and model.idle_seconds() > model.idle_timeout:
+                model.unload("idle")
+
+    def enforce_budget(self, keep: Optional[ResidentModel] = None):
+        """Unload least recently used models until the budget is met"""
+        if self.memory_budget_bytes <= 0:
+            return
+        candidates: List[ResidentModel] = sorted(
+            (m for m in self.models.values() if m.loaded and m is not keep),
+            key=lambda m: m.last_used,
+        )
+        for model in candidates:
+            if self.resident_bytes() <= self.memory_budget_bytes:
+                break
+            model.unload("memory budget")
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.unload_idle()
+                self.enforce_budget()
+            except Exception as e:
+                print(f"⚠ Residency check failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-residency", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 1)
+        self._thread = None
+
+    def stats(self) -> Dict:
+        return {
+            "memory_budget_mb": round(self.memory_budget_bytes / 2**20, 1),
+            "resident_mb": round(self.resident_bytes() / 2**20, 1),
+            "models": {name: model.stats() for name, model in self.models.items()},
+        }
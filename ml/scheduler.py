@@ -0,0 +1,154 @@
+# scheduler.py - Severity-aware priority scheduling for model inference
+import asyncio
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import RollingWindow
+
+# Priority classes, most urgent first
+EMERGENCY = 0
+URGENT = 1
+ROUTINE = 2
+PRIORITY_NAMES = {EMERGENCY: "emergency", URGENT: "urgent", ROUTINE: "routine"}
+
+BatchRunner = Callable[[List[Any]], List[Any]]
+
+
+class _Job:
+    __slots__ = ("kind", "payload", "priority", "enqueued_at", "seq", "future")
+
+    def __init__(self, kind: str, payload: Any, priority: int, seq: int, future: "asyncio.Future"):
+        self.kind = kind
+        self.payload = payload
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.seq = seq
+        self.future = future
+
+
+class InferenceScheduler:
+    """One queue in front of the models, served in priority order.
+
+    Jobs of the same kind are grouped into batches of up to ``max_batch``
+    and handed to that kind's runner in a worker thread. Emergency jobs go
+    first and keep ``reserved_slots`` places in every batch of their kind.
+    Lower classes age: each ``aging_seconds`` spent waiting raises a job by
+    one class, and a job aged up to emergency level is served before newer
+    emergencies, so no class or kind can starve under a stream of urgent work.
+    """
+
+    def __init__(self, runners: Dict[str, BatchRunner], max_batch: int = 8,
+                 aging_seconds: float = 2.0, reserved_slots: int = 1):
+        self.runners = runners
+        self.max_batch = max(1, max_batch)
+        self.aging_seconds = aging_seconds
+        self.reserved_slots = min(reserved_slots, self.max_batch)
+        self._pending: List[_Job] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional["asyncio.Task"] = None
+
+        self.queue_wait = {name: RollingWindow() for name in PRIORITY_NAMES.values()}
+        self.batches_run = 0
+        self.jobs_run = 0
+
+    def start(self):
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for job in self._pending:
+            if not job.future.done():
+                job.future.cancel()
+        self._pending.clear()
+
+    async def submit(self, kind: str, payload: Any, priority: int = ROUTINE) -> Any:
+        """Queue one job and wait for its result"""
+        if kind not in self.runners:
+            raise ValueError(f"No runner registered for '{kind}'")
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_Job(kind, payload, priority, next(self._seq), future))
+        self._wakeup.set()
+        return await future
+
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def _rank(self, job: _Job, now: float) -> float:
+        if self.aging_seconds <= 0:
+            return job.priority
+        aged = job.priority - (now - job.enqueued_at) / self.aging_seconds
+        # Aged jobs may tie with emergencies but never overtake them
+        return max(aged, EMERGENCY)
+
+    def _next_batch(self) -> List[_Job]:
+        # Drop jobs whose callers already went away
+        self._pending = [job for job in self._pending if not job.future.done()]
+        if not self._pending:
+            return []
+
+        now = time.monotonic()
+        # The batch kind follows the best aged rank, so an image job that has
+        # waited long enough gets a batch even while emergency texts keep coming
+        kind = min(self._pending, key=lambda j: (self._rank(j, now), j.seq)).kind
+        emergencies = sorted((j for j in self._pending if j.priority == EMERGENCY), key=lambda j: j.seq)
+
+        same_kind = [j for j in self._pending if j.kind == kind]
+        reserved = [j for j in emergencies if j.kind == kind][:self.reserved_slots]
+        taken = set(id(j) for j in reserved)
+        rest = sorted((j for j in same_kind if id(j) not in taken), key=lambda j: (self._rank(j, now), j.seq))
+        batch = reserved + rest[:self.max_batch - len(reserved)]
+
+        chosen = set(id(j) for j in batch)
+        self._pending = [j for j in self._pending if id(j) not in chosen]
+        for job in batch:
+            self.queue_wait[PRIORITY_NAMES[job.priority]].add(now - job.enqueued_at)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            runner = self.runners[batch[0].kind]
+            try:
+                results = await loop.run_in_executor(None, runner, [job.payload for job in batch])
+            except Exception as e:
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.jobs_run += len(batch)
+            for job, result in zip(batch, results):
+                if not job.future.done():
+                    job.future.set_result(result)
+
+    def stats(self) -> Dict:
+        depth_by_class = {name: 0 for name in PRIORITY_NAMES.values()}
+        for job in self._pending:
+            depth_by_class[PRIORITY_NAMES[job.priority]] += 1
+        return {
+            "queue_depth": len(self._pending),
+            "queue_depth_by_priority": depth_by_class,
+            "queue_wait_by_priority": {name: window.summary() for name, window in self.queue_wait.items()},
+            "batches_run": self.batches_run,
+            "jobs_run": self.jobs_run,
+            "avg_batch_size": round(self.jobs_run / self.batches_run, 2) if self.batches_run else 0.0,
+        }
@@ -0,0 +1,181 @@
+# scoring.py - Sparse symptom→disease scoring engine
+import math
+from bisect import bisect_right
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+# A knowledge base entry maps a symptom either to a plain list of diseases
+# (every edge weighs 1.0) or to a {disease: weight} dict.
+DiseaseEdges = Union[Sequence[str], Mapping[str, float]]
+
+
+def _iter_edges(symptom: str, edges: DiseaseEdges):
+    # The file is edited by hand, so reject anything that would compile into
+    # nonsense (a bare string iterates as one "disease" per character)
+    if isinstance(edges, Mapping):
+        items = edges.items()
+    elif isinstance(edges, (list, tuple)):
+        items = ((disease, 1.0) for disease in edges)
+    else:
+        raise TypeError(f"Diseases for '{symptom}' must be a list or a {{disease: weight}} dict, "
+                        f"not {type(edges).__name__}")
+    for disease, weight in items:
+        if not isinstance(disease, str):
+            raise TypeError(f"Disease names for '{symptom}' must be strings, not {disease!r}")
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not math.isfinite(weight):
+            raise ValueError(f"Weight of '{disease}' for '{symptom}' must be a finite number, not {weight!r}")
+        yield disease, float(weight)
+
+
+class DiseaseScorer:
+    """Symptom→disease relation compiled into a CSR matrix.
+
+    Rows are symptoms (primary rules first, then fallback rules), columns are
+    diseases. Scoring a batch of requests is a single sparse product of the
+    request/symptom match matrix with the relation matrix, followed by top-k
+    selection over the non-zero entries of each row.
+    """
+
+    def __init__(self, primary: Mapping[str, DiseaseEdges], fallback: Mapping[str, DiseaseEdges],
+                 image_classes: Sequence[str] = ()):
+        self.symptoms: List[str] = list(primary.keys()) + list(fallback.keys())
+        self.n_primary = len(primary)
+
+        self.diseases: List[str] = []
+        self.disease_index: Dict[str, int] = {}
+        self._lower_index: Dict[str, int] = {}
+        rows, cols, weights = [], [], []
+        for row, sym in enumerate(self.symptoms):
+            edges = primary[sym] if row < self.n_primary else fallback[sym]
+            for disease, weight in _iter_edges(sym, edges):
+                rows.append(row)
+                cols.append(self._disease_column(disease))
+                weights.append(weight)
+        self.n_kb_diseases = len(self.diseases)
+
+        # Image classes share the disease columns so image probabilities can
+        # be fused with text scores in the same product. Classes unknown to
+        # the knowledge base get columns of their own after the KB diseases.
+        class_cols = [self._disease_column(name, case_insensitive=True) for name in image_classes]
+        self.n_image_classes = len(class_cols)
+        self.image_projection = sparse.csr_matrix(
+            (np.ones(len(class_cols), dtype=np.float32), (np.arange(len(class_cols)), class_cols)),
+            shape=(len(class_cols), len(self.diseases)),
+        )
+
+        self.matrix = sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float32), (rows, cols)),
+            shape=(len(self.symptoms), len(self.diseases)),
+        )
+
+        # Substring lookups in both directions, without scanning every row:
+        # vocabulary-in-symptom goes through the dict, symptom-in-vocabulary
+        # through str.find over the newline-joined vocabulary.
+        lowered = [sym.lower() for sym in self.symptoms]
+        self._rows_by_name: Dict[str, List[int]] = {}
+        for row, sym in enumerate(lowered):
+            self._rows_by_name.setdefault(sym, []).append(row)
+        self._max_name_len = max((len(sym) for sym in lowered), default=0)
+        self._joined = "\n".join(lowered)
+        self._starts: List[int] = []
+        offset = 0
+        for sym in lowered:
+            self._starts.append(offset)
+            offset += len(sym) + 1
+
+    def _disease_column(self, name: str, case_insensitive: bool = False) -> int:
+        col = self.disease_index.get(name)
+        if col is None and case_insensitive:
+            col = self._lower_index.get(name.lower())
+        if col is None:
+            col = len(self.diseases)
+            self.diseases.append(name)
+            self.disease_index[name] = col
+            self._lower_index.setdefault(name.lower(), col)
+        return col
+
+    @property
+    def kb_diseases(self) -> List[str]:
+        return self.diseases[:self.n_kb_diseases]
+
+    def match_rows(self, symptom: str) -> List[int]:
+        """Knowledge base rows matching an extracted symptom.
+
+        A row matches when either string contains the other. Fallback rows
+        are only used when no primary row matched.
+        """
+        s = symptom.lower().strip().replace("\n", " ")
+        if not s:
+            return []
+
+        matched = set()
+        # Vocabulary entries contained in the symptom
+        for i in range(len(s)):
+            for j in range(i + 1, min(len(s), i + self._max_name_len) + 1):
+                rows = self._rows_by_name.get(s[i:j])
+                if rows:
+                    matched.update(rows)
+        # Symptom contained in vocabulary entries
+        pos = self._joined.find(s)
+        while pos != -1:
+            row = bisect_right(self._starts, pos) - 1
+            matched.add(row)
+            if row + 1 >= len(self._starts):
+                break
+            pos = self._joined.find(s, self._starts[row + 1])
+
+        primary_rows = sorted(r for r in matched if r < self.n_primary)
+        if primary_rows:
+            return primary_rows
+        return sorted(matched)
+
+    def query_matrix(self, batch_symptoms: Sequence[Sequence[str]]) -> sparse.csr_matrix:
+        """Request×symptom count matrix for a batch of extracted symptom lists"""
+        rows, cols = [], []
+        for b, symptoms in enumerate(batch_symptoms):
+            for s in symptoms:
+                for row in self.match_rows(s):
+                    rows.append(b)
+                    cols.append(row)
+        # Duplicate (request, row) pairs are summed, matching repeated mentions
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(batch_symptoms), len(self.symptoms)),
+        )
+
+    def score_batch(self, batch_symptoms: Sequence[Sequence[str]], image_probs: Optional[np.ndarray] = None,
+                    image_weight: float = 2.0, top_k: Optional[int] = 10) -> List[List[Tuple[str, float]]]:
+        """Score many requests at once and return the top-k diseases for each.
+
+        ``image_probs`` is an optional (batch, n_image_classes) array of class
+        probabilities, fused into the disease scores with ``image_weight``.
+        """
+        scores = self.query_matrix(batch_symptoms) @ self.matrix
+        if image_probs is not None:
+            probs = np.atleast_2d(np.asarray(image_probs, dtype=np.float32))
+            if probs.shape != (len(batch_symptoms), self.n_image_classes):
+                raise ValueError(
+                    f"image_probs shape {probs.shape} does not match "
+                    f"({len(batch_symptoms)}, {self.n_image_classes})"
+                )
+            scores = scores + image_weight * (sparse.csr_matrix(probs) @ self.image_projection)
+        scores = sparse.csr_matrix(scores)
+        scores.eliminate_zeros()
+
+        return [self._top_k_row(scores, b, top_k) for b in range(scores.shape[0])]
+
+    def _top_k_row(self, scores: sparse.csr_matrix, row: int, top_k: Optional[int]) -> List[Tuple[str, float]]:
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        values = scores.data[start:end]
+        cols = scores.indices[start:end]
+        if top_k is not None and len(values) > top_k:
+            # Keep everything tied with the k-th best score so the cut below is
+            # made on (-score, column) rather than wherever argpartition lands
+            threshold = np.partition(values, len(values) - top_k)[len(values) - top_k]
+            keep = values >= threshold
+            values, cols = values[keep], cols[keep]
+        # Highest score first, ties in knowledge base order
+        order = np.lexsort((cols, -values))[:top_k]
+        return [(self.diseases[cols[i]], round(float(values[i]), 4)) for i in order]
@@ -0,0 +1,53 @@
+# singleflight.py - Coalesce identical in-flight computations
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time.
+
+    Callers arriving while a computation for the same key is running attach
+    to it and receive its result (or exception) instead of starting another
+    one. Nothing is kept once the computation finishes, so this is not a
+    cache: a request arriving afterwards computes again.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Task"] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a computation for ``key`` is currently running"""
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            # The computation runs as its own task so one caller disconnecting
+            # does not cancel it for the others attached to it
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda t, k=key: self._finished(k, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: "asyncio.Task"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        total = self.executed + self.coalesced
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
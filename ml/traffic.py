@@ -0,0 +1,175 @@
+# traffic.py - Opt-in request capture for performance replay
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from email.parser import BytesParser
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+# Response fields that identify a prediction result; timings, confidences and
+# versions are left out so replays only diff on what the user would see.
+SUMMARY_FIELDS = ("symptoms", "severity")
+
+
+def summarize_response(body: bytes) -> Optional[Dict]:
+    """Reduce a prediction response to the fields used for result diffs"""
+    try:
+        data = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(data, dict) or "diseases" not in data:
+        return None
+    summary = {field: data.get(field) for field in SUMMARY_FIELDS}
+    summary["diseases"] = [d.get("name") for d in data.get("diseases", []) if isinstance(d, dict)]
+    return summary
+
+
+def summary_digest(summary: Optional[Dict]) -> Optional[str]:
+    if summary is None:
+        return None
+    encoded = json.dumps(summary, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def _multipart_files(body: bytes, content_type: str) -> List[bytes]:
+    """File payloads of a multipart/form-data body"""
+    message = BytesParser().parsebytes(b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    if not message.is_multipart():
+        return []
+    return [
+        part.get_payload(decode=True) or b""
+        for part in message.get_payload()
+        if part.get_filename() is not None
+    ]
+
+
+def _image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    from PIL import Image  # only needed when images are captured
+    try:
+        return Image.open(BytesIO(data)).size
+    except Exception:
+        return None
+
+
+class TrafficRecorder:
+    """ASGI middleware appending one compact JSON line per HTTP request.
+
+    By default bodies are redacted: only sizes, text lengths, image sizes and
+    SHA-256 hashes are logged. With ``store_bodies`` the raw request bodies
+    (and query strings) are also written next to the log, content-addressed
+    under ``<path>.blobs/``, so that ``replay.py`` can send them again.
+    """
+
+    def __init__(self, app, path: str, store_bodies: bool = False):
+        self.app = app
+        self.path = path
+        self.store_bodies = store_bodies
+        self.blob_dir = path + ".blobs"
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if store_bodies:
+            os.makedirs(self.blob_dir, exist_ok=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        started = time.perf_counter()
+        request_body: List[bytes] = []
+        response_body: List[bytes] = []
+        response = {"status": 500}
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.append(message.get("body", b""))
+            return message
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            # The response has been sent already; write the record off the event loop
+            asyncio.get_running_loop().run_in_executor(
+                None, self._write, scope, started_at, elapsed, response["status"],
+                b"".join(request_body), b"".join(response_body),
+            )
+
+    def _write(self, scope, started_at: float, elapsed: float, status: int, body: bytes, response_body: bytes):
+        try:
+            record = self._record(scope, started_at, elapsed, status, body, response_body)
+            line = json.dumps(record, separators=(",", ":")) + "\n"
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except Exception as e:
+            print(f"⚠ Traffic capture failed: {e}")
+
+    def _record(self, scope, started_at: float, elapsed: float, status: int, body: bytes,
+                response_body: bytes) -> Dict:
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        content_type = headers.get("content-type", "")
+        query = scope.get("query_string", b"").decode("latin-1")
+
+        record = {
+            "ts": round(started_at, 6),
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "ms": round(elapsed * 1000, 3),
+            "content_type": content_type,
+            "size": len(body),
+            "sha256": hashlib.sha256(body).hexdigest(),
+        }
+
+        text_len = None
+        if query:
+            params = parse_qs(query)
+            if "text" in params:
+                text_len = len(params["text"][0])
+        if content_type.startswith("application/json") and body:
+            try:
+                payload = json.loads(body.decode("utf-8"))
+                if isinstance(payload, dict) and isinstance(payload.get("text"), str):
+                    text_len = len(payload["text"])
+            except (UnicodeDecodeError, ValueError):
+                pass
+        if text_len is not None:
+            record["text_len"] = text_len
+
+        if content_type.startswith("multipart/form-data") and body:
+            images = []
+            for data in _multipart_files(body, content_type):
+                size = _image_size(data)
+                images.append({"bytes": len(data), "size": list(size) if size else None})
+            record["images"] = images
+
+        summary = summarize_response(response_body)
+        record["result"] = summary_digest(summary)
+
+        if self.store_bodies:
+            record["query"] = query
+            if body:
+                blob_path = os.path.join(self.blob_dir, record["sha256"])
+                if not os.path.exists(blob_path):
+                    with open(blob_path, "wb") as f:
+                        f.write(body)
+            if summary is not None:
+                record["summary"] = summary
+        elif query:
+            record["query_sha256"] = hashlib.sha256(query.encode("latin-1")).hexdigest()
+        return record